@@ -8,19 +8,28 @@ import asyncio
 import logging
 import os
 import re
-import json
 import time
 import hashlib
 import random
+import ssl
 import string
 from typing import Optional, Dict, Any, List, Tuple
 from dataclasses import dataclass, field
-from urllib.parse import urlencode, unquote, urlparse, parse_qs, urlunparse
+from functools import cached_property, lru_cache
+from types import MappingProxyType
+from urllib.parse import urlencode, unquote, parse_qs, urlunparse
 
 import aiohttp
+import orjson
+from cachetools import TTLCache
 from aiohttp import web
 from dotenv import load_dotenv
 
+try:
+    import uvloop
+except ImportError:  # Not available on Windows
+    uvloop = None
+
 from aiogram import Bot, Dispatcher, Router, F
 from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.filters import CommandStart, Command
@@ -36,6 +45,10 @@ BOT_TOKEN = os.getenv("BOT_TOKEN", "")
 WEBHOOK_URL = os.getenv("RENDER_EXTERNAL_URL", "")
 PORT = int(os.getenv("PORT", "10000"))
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "16"))
+DNS_NAMESERVERS = [s.strip() for s in os.getenv("DNS_NAMESERVERS", "1.1.1.1,8.8.8.8").split(",") if s.strip()]
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", "3600"))
 
 # Setup logging
 logging.basicConfig(
@@ -49,6 +62,36 @@ logging.getLogger("aiohttp").setLevel(logging.WARNING)
 logging.getLogger("aiogram").setLevel(logging.WARNING)
 
 
+# ==================== COMPILED PATTERNS ====================
+
+# Host part (netloc) of an http(s) URL
+_HOST_PATTERN = re.compile(r"^https?://([^/?#]+)", re.IGNORECASE)
+
+# Share URL formats, normalized to /s/1{surl}:
+#   /s/1xxxxx, /wap/s/1xxxxx, ?surl=1xxxxx, /sharing/link?surl=1xxxxx,
+#   /web/share/link?surl=1xxxxx (the leading "1" is optional)
+_SURL_PATTERN = re.compile(r"(?:/s/|[?&]surl=)1?([a-zA-Z0-9_-]+)")
+
+# Share page data fields
+_PAGE_PATTERNS = {
+    "shareid": (re.compile(r'"shareid"\s*:\s*(\d+)'), re.compile(r'shareid["\s:=]+(\d+)')),
+    "uk": (re.compile(r'"uk"\s*:\s*(\d+)'), re.compile(r'uk["\s:=]+(\d+)')),
+    "sign": (re.compile(r'"sign"\s*:\s*"([^"]+)"'), re.compile(r"sign[\"\\s:=]+'([^']+)'")),
+    "timestamp": (re.compile(r'"timestamp"\s*:\s*(\d+)'), re.compile(r'timestamp["\s:=]+(\d+)')),
+    "js_token": (re.compile(r'"jsToken"\s*:\s*"([^"]+)"'), re.compile(r"jsToken[\"\\s:=]+'([^']+)'")),
+    "bdstoken": (re.compile(r'"bdstoken"\s*:\s*"([^"]+)"'), re.compile(r"bdstoken[\"\\s:=]+'([^']+)'")),
+}
+
+# Start of an embedded "list": [...] array
+_FILE_LIST_PATTERN = re.compile(r'"list"\s*:\s*\[')
+
+# Tokens that matter for bracket matching: escapes, brackets, quotes
+_JSON_TOKEN_PATTERN = re.compile(r'\\.|[\[\]"]', re.DOTALL)
+
+# Tuple so str.endswith can test every suffix in one call
+_VIDEO_EXTS = (".mp4", ".mkv", ".avi", ".mov", ".wmv", ".flv", ".webm", ".m4v", ".ts", ".3gp", ".3g2")
+
+
 # ==================== VERIFIED DOMAIN LIST ====================
 
 class DomainManager:
@@ -114,23 +157,7 @@ class DomainManager:
     @staticmethod
     def is_terabox_url(url: str) -> bool:
         """Check if URL belongs to Terabox ecosystem."""
-        try:
-            parsed = urlparse(url)
-            domain = parsed.netloc.lower().replace("www.", "")
-            
-            # Check exact match
-            for d in DomainManager.DOMAINS:
-                if d.replace("www.", "") == domain:
-                    return True
-            
-            # Check substring match for safety
-            if any(keyword in domain for keyword in ["terabox", "tera", "box", "dubox"]):
-                return True
-            
-        except Exception:
-            pass
-        
-        return False
+        return _is_terabox_url(url)
     
     @staticmethod
     def extract_surl(url: str) -> Optional[Tuple[str, str]]:
@@ -138,45 +165,108 @@ class DomainManager:
         Extract surl and normalized URL.
         Returns: (surl, normalized_url)
         """
-        # Patterns for different URL formats
-        patterns = [
-            # /s/1xxxxx or /s/xxxxx
-            (r"/s/1?([a-zA-Z0-9_-]+)", "/s/1{surl}"),
-            # surl=1xxxxx or surl=xxxxx
-            (r"[?&]surl=1?([a-zA-Z0-9_-]+)", "/s/1{surl}"),
-            # /sharing/link?surl=1xxxxx
-            (r"/sharing/link\?surl=1?([a-zA-Z0-9_-]+)", "/s/1{surl}"),
-            # /wap/s/1xxxxx
-            (r"/wap/s/1?([a-zA-Z0-9_-]+)", "/s/1{surl}"),
-            # /web/share/link?surl=1xxxxx
-            (r"/web/share/link\?surl=1?([a-zA-Z0-9_-]+)", "/s/1{surl}"),
-        ]
-        
-        for pattern, template in patterns:
-            match = re.search(pattern, url)
-            if match:
-                surl = match.group(1)
-                # Normalize to /s/1{surl}
-                normalized = template.format(surl=surl)
-                return surl, normalized
-        
-        return None, None
+        return _extract_surl(url)
     
     @staticmethod
-    def get_api_url(endpoint: str, surl: str = "") -> str:
+    def get_api_url(endpoint: str) -> str:
         """Get verified API URL for endpoint."""
-        base = f"https://{DomainManager.API_DOMAIN}"
-        endpoint_path = DomainManager.API_ENDPOINTS.get(endpoint, "")
+        url = _API_URLS.get(endpoint)
         
-        if not endpoint_path:
+        if not url:
             raise ValueError(f"Unknown endpoint: {endpoint}")
         
-        if surl:
-            # For some endpoints, surl is in query string
-            if endpoint in ["shorturlinfo", "share_wxlist"]:
-                return f"{base}{endpoint_path}?surl=1{surl}"
-        
-        return f"{base}{endpoint_path}"
+        return url
+
+
+_API_BASE = f"https://{DomainManager.API_DOMAIN}"
+
+# Full API URLs; share-specific values go in query params
+_API_URLS = {name: _API_BASE + path for name, path in DomainManager.API_ENDPOINTS.items()}
+
+_SHARE_URL_PREFIX = _API_BASE + "/s/1"
+
+# Response keys that may carry a stream URL, in order of preference
+_STREAM_KEYS = ("dlink", "lurl", "url", "mlink")
+
+# Bare domains for O(1) membership checks
+_DOMAIN_SET = frozenset(d.removeprefix("www.") for d in DomainManager.DOMAINS)
+
+# Fallback substrings ("tera" already covers "terabox", "box" covers "dubox")
+_DOMAIN_KEYWORDS = ("tera", "box")
+
+
+# Memoized at module level so every caller shares one cache
+@lru_cache(maxsize=4096)
+def _is_terabox_url(url: str) -> bool:
+    match = _HOST_PATTERN.match(url)
+    if not match:
+        return False
+    
+    domain = match.group(1).lower().removeprefix("www.")
+    
+    # Check exact match
+    if domain in _DOMAIN_SET:
+        return True
+    
+    # Check substring match for safety
+    if any(keyword in domain for keyword in _DOMAIN_KEYWORDS):
+        return True
+    
+    return False
+
+
+@lru_cache(maxsize=4096)
+def _extract_surl(url: str) -> Optional[Tuple[str, str]]:
+    match = _SURL_PATTERN.search(url)
+    if match:
+        surl = match.group(1)
+        # Normalize to /s/1{surl}
+        return surl, f"/s/1{surl}"
+    
+    return None, None
+
+
+# ==================== HTTP HEADERS ====================
+
+# Read-only so shared headers can't be mutated by accident
+_API_HEADERS = MappingProxyType({
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36",
+    "Accept": "application/json, text/plain, */*",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Accept-Encoding": "gzip, deflate, br",
+    "Connection": "keep-alive",
+    "sec-ch-ua": '"Google Chrome";v="125", "Chromium";v="125", "Not.A/Brand";v="24"',
+    "sec-ch-ua-mobile": "?0",
+    "sec-ch-ua-platform": '"Windows"',
+    "Sec-Fetch-Dest": "empty",
+    "Sec-Fetch-Mode": "cors",
+    "Sec-Fetch-Site": "same-origin",
+    "X-Requested-With": "XMLHttpRequest",
+})
+
+_PAGE_HEADERS = MappingProxyType({
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Accept-Encoding": "gzip, deflate, br",
+    "Connection": "keep-alive",
+    "Upgrade-Insecure-Requests": "1",
+    "sec-ch-ua": '"Google Chrome";v="125", "Chromium";v="125", "Not.A/Brand";v="24"',
+    "sec-ch-ua-mobile": "?0",
+    "sec-ch-ua-platform": '"Windows"',
+    "Sec-Fetch-Dest": "document",
+    "Sec-Fetch-Mode": "navigate",
+    "Sec-Fetch-Site": "none",
+    "Sec-Fetch-User": "?1",
+    "Cache-Control": "max-age=0",
+})
+
+# Mobile user agent
+_WAP_HEADERS = MappingProxyType({
+    "User-Agent": "Mozilla/5.0 (Linux; Android 10; SM-G975F) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Mobile Safari/537.36",
+    "Accept": "application/json",
+    "Accept-Language": "en-US,en;q=0.9",
+})
 
 
 # ==================== DATA CLASSES ====================
@@ -188,7 +278,6 @@ class VideoResult:
     title: str = ""
     filename: str = ""
     size: int = 0
-    size_str: str = ""
     thumbnail: str = ""
     stream_url: str = ""
     download_url: str = ""
@@ -198,7 +287,9 @@ class VideoResult:
     surl: str = ""
     error: str = ""
     
-    def format_size(self) -> str:
+    @cached_property
+    def size_str(self) -> str:
+        """Human-readable size, computed on first access."""
         if self.size <= 0:
             return "Unknown"
         size = self.size
@@ -211,77 +302,31 @@ class VideoResult:
 
 # ==================== TERABOX EXTRACTOR ====================
 
+# Successful results by surl; dlinks stay valid for several hours
+_RESULT_CACHE: TTLCache = TTLCache(maxsize=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL)
+
+# Extractions currently running, by surl
+_INFLIGHT: Dict[str, asyncio.Task] = {}
+
+
 class TeraboxExtractor:
     """Verified Terabox extractor with actual API paths."""
     
-    def __init__(self):
-        self._session: Optional[aiohttp.ClientSession] = None
+    def __init__(self, session: aiohttp.ClientSession):
+        self._session = session
         self._domain_idx = 0
         self._session_data: Dict[str, Any] = {}
-        
-    async def get_session(self) -> aiohttp.ClientSession:
-        """Get or create HTTP session."""
-        if self._session is None or self._session.closed:
-            timeout = aiohttp.ClientTimeout(total=30)
-            connector = aiohttp.TCPConnector(
-                ssl=False,
-                limit=10,
-                limit_per_host=5,
-                ttl_dns_cache=300,
-            )
-            self._session = aiohttp.ClientSession(
-                timeout=timeout,
-                connector=connector,
-                cookie_jar=aiohttp.CookieJar(unsafe=True),
-            )
-        return self._session
-    
-    async def close(self):
-        """Close session."""
-        if self._session and not self._session.closed:
-            await self._session.close()
+        self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
     
     def get_headers(self, referer: str = "") -> Dict[str, str]:
         """Get verified browser headers."""
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36",
-            "Accept": "application/json, text/plain, */*",
-            "Accept-Language": "en-US,en;q=0.9",
-            "Accept-Encoding": "gzip, deflate, br",
-            "Connection": "keep-alive",
-            "sec-ch-ua": '"Google Chrome";v="125", "Chromium";v="125", "Not.A/Brand";v="24"',
-            "sec-ch-ua-mobile": "?0",
-            "sec-ch-ua-platform": '"Windows"',
-            "Sec-Fetch-Dest": "empty",
-            "Sec-Fetch-Mode": "cors",
-            "Sec-Fetch-Site": "same-origin",
-            "X-Requested-With": "XMLHttpRequest",
-        }
-        
         if referer:
-            headers["Referer"] = referer
-            headers["Origin"] = f"https://{DomainManager.API_DOMAIN}"
-        
-        return headers
+            return _API_HEADERS | {"Referer": referer, "Origin": _API_BASE}
+        return dict(_API_HEADERS)
     
     def get_page_headers(self) -> Dict[str, str]:
         """Get headers for page requests."""
-        return {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
-            "Accept-Language": "en-US,en;q=0.9",
-            "Accept-Encoding": "gzip, deflate, br",
-            "Connection": "keep-alive",
-            "Upgrade-Insecure-Requests": "1",
-            "sec-ch-ua": '"Google Chrome";v="125", "Chromium";v="125", "Not.A/Brand";v="24"',
-            "sec-ch-ua-mobile": "?0",
-            "sec-ch-ua-platform": '"Windows"',
-            "Sec-Fetch-Dest": "document",
-            "Sec-Fetch-Mode": "navigate",
-            "Sec-Fetch-Site": "none",
-            "Sec-Fetch-User": "?1",
-            "Cache-Control": "max-age=0",
-        }
+        return dict(_PAGE_HEADERS)
     
     async def extract(self, url: str) -> VideoResult:
         """Extract video from any Terabox URL."""
@@ -302,7 +347,26 @@ class TeraboxExtractor:
         logger.info(f"Extracting from: {url}")
         logger.info(f"Share ID: {surl}")
         
-        # Try verified extraction methods in order
+        # Reuse a recent result for the same share
+        cached = _RESULT_CACHE.get(surl)
+        if cached is not None:
+            logger.info(f"Cache hit: {surl}")
+            return cached
+        
+        # Join an extraction already running for the same share
+        task = _INFLIGHT.get(surl)
+        if task is None:
+            task = asyncio.create_task(self._extract_share(surl, url))
+            _INFLIGHT[surl] = task
+            task.add_done_callback(lambda _: _INFLIGHT.pop(surl, None))
+        else:
+            logger.info(f"Joining in-flight extraction: {surl}")
+        
+        # Shielded so one caller going away doesn't cancel it for the others
+        return await asyncio.shield(task)
+    
+    async def _extract_share(self, surl: str, url: str) -> VideoResult:
+        """Run verified extraction methods concurrently, first success wins."""
         extraction_methods = [
             self._extract_method_shorturlinfo,
             self._extract_method_sharelist,
@@ -310,32 +374,54 @@ class TeraboxExtractor:
             self._extract_method_alternative,
         ]
         
-        for method_idx, method in enumerate(extraction_methods, 1):
+        tasks = [
+            asyncio.create_task(self._run_method(method_idx, method, surl, url))
+            for method_idx, method in enumerate(extraction_methods, 1)
+        ]
+        
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                video_result = await next_done
+                if video_result and video_result.success and video_result.stream_url:
+                    _RESULT_CACHE[surl] = video_result
+                    return video_result
+        finally:
+            pending = [t for t in tasks if not t.done()]
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        
+        return VideoResult(
+            surl=surl,
+            error="All verified extraction methods failed. Link may be private, expired, or blocked.",
+        )
+    
+    async def _run_method(self, method_idx: int, method, surl: str, url: str) -> Optional[VideoResult]:
+        """Run one extraction method under the concurrency limit."""
+        async with self._semaphore:
             try:
                 logger.info(f"Trying method {method_idx}...")
                 video_result = await method(surl, url)
                 
                 if video_result.success and video_result.stream_url:
                     logger.info(f"Method {method_idx} succeeded!")
-                    return video_result
-                    
+                return video_result
+                
             except Exception as e:
                 logger.warning(f"Method {method_idx} failed: {e}")
-                continue
-        
-        result.error = "All verified extraction methods failed. Link may be private, expired, or blocked."
-        return result
+                return None
     
     async def _extract_method_shorturlinfo(self, surl: str, original_url: str) -> VideoResult:
         """Method 1: Direct API (shorturlinfo) - Most reliable."""
         result = VideoResult()
         result.surl = surl
         
-        session = await self.get_session()
-        api_url = DomainManager.get_api_url("shorturlinfo", surl)
+        session = self._session
+        api_url = DomainManager.get_api_url("shorturlinfo")
         
         params = {
             "app_id": "250528",
+            "surl": f"1{surl}",
             "shorturl": f"1{surl}",
             "root": "1",
         }
@@ -346,7 +432,7 @@ class TeraboxExtractor:
             if resp.status != 200:
                 raise Exception(f"HTTP {resp.status}")
             
-            data = await resp.json()
+            data = orjson.loads(await resp.read())
             
             # Check for errors
             if data.get("errno") != 0:
@@ -366,7 +452,6 @@ class TeraboxExtractor:
             result.title = target.get("server_filename", "Unknown")
             result.filename = target.get("server_filename", "Unknown")
             result.size = int(target.get("size", 0))
-            result.size_str = result.format_size()
             result.fs_id = str(target.get("fs_id", ""))
             result.share_id = str(data.get("shareid", ""))
             result.uk = str(data.get("uk", ""))
@@ -403,15 +488,20 @@ class TeraboxExtractor:
         result = VideoResult()
         result.surl = surl
         
-        session = await self.get_session()
+        session = self._session
         
         # Step 1: Fetch page to get tokens
-        page_url = f"https://{DomainManager.API_DOMAIN}/s/1{surl}"
+        page_url = _SHARE_URL_PREFIX + surl
         headers = self.get_page_headers()
         
         async with session.get(page_url, headers=headers, allow_redirects=True) as resp:
             html = await resp.text()
-            cookies = {c.key: c.value for c in resp.cookies.values()}
+            
+            # The cookie jar files cookies under the final host, so it won't
+            # send them to the API domain if the page redirected to a mirror
+            cookie_header = ""
+            if resp.url.host != DomainManager.API_DOMAIN:
+                cookie_header = "; ".join(f"{c.key}={c.value}" for c in resp.cookies.values())
         
         # Step 2: Parse page for required data
         page_data = self._parse_page_data(html)
@@ -435,10 +525,11 @@ class TeraboxExtractor:
         }
         
         api_headers = self.get_headers(page_url)
-        api_headers["Cookie"] = "; ".join(f"{k}={v}" for k, v in cookies.items())
+        if cookie_header:
+            api_headers = api_headers | {"Cookie": cookie_header}
         
         async with session.get(list_url, params=params, headers=api_headers) as resp:
-            data = await resp.json()
+            data = orjson.loads(await resp.read())
         
         file_list = data.get("list", [])
         if not file_list:
@@ -452,7 +543,6 @@ class TeraboxExtractor:
         result.title = target.get("server_filename", "Unknown")
         result.filename = target.get("server_filename", "Unknown")
         result.size = int(target.get("size", 0))
-        result.size_str = result.format_size()
         result.fs_id = str(target.get("fs_id", ""))
         result.share_id = str(page_data.get("shareid", ""))
         result.uk = str(page_data.get("uk", ""))
@@ -481,25 +571,19 @@ class TeraboxExtractor:
         result = VideoResult()
         result.surl = surl
         
-        session = await self.get_session()
+        session = self._session
         
-        # Mobile user agent
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Linux; Android 10; SM-G975F) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Mobile Safari/537.36",
-            "Accept": "application/json",
-            "Accept-Language": "en-US,en;q=0.9",
-        }
-        
-        api_url = DomainManager.get_api_url("share_wxlist", surl)
+        api_url = DomainManager.get_api_url("share_wxlist")
         params = {
+            "surl": f"1{surl}",
             "shorturl": f"1{surl}",
             "root": "1",
             "page": "1",
             "num": "20",
         }
         
-        async with session.get(api_url, params=params, headers=headers) as resp:
-            data = await resp.json()
+        async with session.get(api_url, params=params, headers=_WAP_HEADERS) as resp:
+            data = orjson.loads(await resp.read())
         
         file_list = data.get("list", [])
         if not file_list:
@@ -513,7 +597,6 @@ class TeraboxExtractor:
         result.title = target.get("server_filename", "Unknown")
         result.filename = target.get("server_filename", "Unknown")
         result.size = int(target.get("size", 0))
-        result.size_str = result.format_size()
         result.fs_id = str(target.get("fs_id", ""))
         
         # Get stream URL from dlink
@@ -530,7 +613,7 @@ class TeraboxExtractor:
         result = VideoResult()
         result.surl = surl
         
-        session = await self.get_session()
+        session = self._session
         
         # Try filemetas endpoint
         try:
@@ -544,7 +627,7 @@ class TeraboxExtractor:
             headers = self.get_headers()
             
             async with session.get(api_url, params=params, headers=headers) as resp:
-                data = await resp.json()
+                data = orjson.loads(await resp.read())
             
             if data.get("info") and isinstance(data["info"], list):
                 info = data["info"][0]
@@ -553,7 +636,6 @@ class TeraboxExtractor:
                     result.download_url = info["dlink"]
                     result.title = info.get("filename", "Unknown")
                     result.size = int(info.get("size", 0))
-                    result.size_str = result.format_size()
                     result.success = True
                     return result
                     
@@ -564,36 +646,36 @@ class TeraboxExtractor:
     
     async def _get_stream_url(self, surl: str, share_id: str, uk: str, fs_id: str, sign: str, timestamp: str) -> Optional[str]:
         """Get streaming URL from verified endpoints."""
-        session = await self.get_session()
+        session = self._session
         
         # Try endpoints in order
         endpoints = [
-            ("/share/streaming", {"type": "M3U8_AUTO_720", "fid": fs_id}),
-            ("/share/download", {"fid_list": f"[{fs_id}]"}),
+            ("share_streaming", {"type": "M3U8_AUTO_720", "fid": fs_id}),
+            ("share_download", {"fid_list": f"[{fs_id}]"}),
         ]
         
+        headers = self.get_headers(_SHARE_URL_PREFIX + surl)
+        base_params = {
+            "app_id": "250528",
+            "channel": "chunlei",
+            "clienttype": "0",
+            "web": "1",
+            "shareid": share_id,
+            "uk": uk,
+            "sign": sign,
+            "timestamp": timestamp,
+        }
+        
         for endpoint, extra_params in endpoints:
             try:
-                url = f"https://{DomainManager.API_DOMAIN}{endpoint}"
-                params = {
-                    "app_id": "250528",
-                    "channel": "chunlei",
-                    "clienttype": "0",
-                    "web": "1",
-                    "shareid": share_id,
-                    "uk": uk,
-                    "sign": sign,
-                    "timestamp": timestamp,
-                }
-                params.update(extra_params)
-                
-                headers = self.get_headers(f"https://{DomainManager.API_DOMAIN}/s/1{surl}")
+                url = DomainManager.get_api_url(endpoint)
+                params = base_params | extra_params
                 
                 async with session.get(url, params=params, headers=headers) as resp:
-                    data = await resp.json()
+                    data = orjson.loads(await resp.read())
                 
                 # Check for stream URL
-                for key in ["dlink", "lurl", "url", "mlink"]:
+                for key in _STREAM_KEYS:
                     if data.get(key):
                         return data[key]
                 
@@ -616,53 +698,69 @@ class TeraboxExtractor:
         """Parse page HTML for required data."""
         data = {}
         
-        # Patterns for different data fields
-        patterns = {
-            "shareid": [r'"shareid"\s*:\s*(\d+)', r'shareid["\s:=]+(\d+)'],
-            "uk": [r'"uk"\s*:\s*(\d+)', r'uk["\s:=]+(\d+)'],
-            "sign": [r'"sign"\s*:\s*"([^"]+)"', r"sign[\"\\s:=]+'([^']+)'"],
-            "timestamp": [r'"timestamp"\s*:\s*(\d+)', r'timestamp["\s:=]+(\d+)'],
-            "js_token": [r'"jsToken"\s*:\s*"([^"]+)"', r"jsToken[\"\\s:=]+'([^']+)'"],
-            "bdstoken": [r'"bdstoken"\s*:\s*"([^"]+)"', r"bdstoken[\"\\s:=]+'([^']+)'"],
-        }
-        
-        for key, pats in patterns.items():
+        for key, pats in _PAGE_PATTERNS.items():
             for pat in pats:
-                match = re.search(pat, html)
+                match = pat.search(html)
                 if match:
                     data[key] = match.group(1)
                     break
         
         # Try to find file list in page
-        file_list_match = re.search(r'"list"\s*:\s*(\[.*?\])\s*[,}]', html, re.DOTALL)
-        if file_list_match:
-            try:
-                data["file_list"] = json.loads(file_list_match.group(1))
-            except:
-                pass
+        if '"list"' in html:
+            file_list_match = _FILE_LIST_PATTERN.search(html)
+            if file_list_match:
+                file_list_json = self._slice_json_array(html, file_list_match.end() - 1)
+                try:
+                    data["file_list"] = orjson.loads(file_list_json)
+                except:
+                    pass
         
         return data
     
+    def _slice_json_array(self, text: str, start: int) -> str:
+        """Slice the JSON array opening at text[start] by matching brackets."""
+        depth = 0
+        in_string = False
+        
+        # Linear scan; brackets inside strings and escaped quotes are skipped
+        for token in _JSON_TOKEN_PATTERN.finditer(text, start):
+            char = token.group()
+            if char == '"':
+                in_string = not in_string
+            elif in_string:
+                continue
+            elif char == "[":
+                depth += 1
+            elif char == "]":
+                depth -= 1
+                if depth == 0:
+                    return text[start:token.end()]
+        
+        return ""
+    
     def _find_video_file(self, file_list: List[Dict]) -> Optional[Dict]:
         """Find video file in list."""
-        video_exts = {".mp4", ".mkv", ".avi", ".mov", ".wmv", ".flv", ".webm", ".m4v", ".ts", ".3gp", ".3g2"}
-        
-        # First pass: by extension
-        for f in file_list:
-            name = f.get("server_filename", f.get("filename", "")).lower()
-            if any(name.endswith(ext) for ext in video_exts):
-                return f
-        
-        # Second pass: by category (1 = video)
-        for f in file_list:
-            if f.get("category") == 1:
-                return f
+        by_category = None
+        by_mime = None
         
-        # Third pass: by MIME type
+        # Single pass: extension wins outright, category (1 = video) and
+        # MIME type are remembered as fallbacks
         for f in file_list:
-            mime = f.get("mime_type", "").lower()
-            if "video" in mime:
+            name = (f.get("server_filename") or f.get("filename") or "").lower()
+            if name.endswith(_VIDEO_EXTS):
                 return f
+            # A category match outranks any MIME match, so stop checking
+            # fallbacks once one is found
+            if by_category is None:
+                if f.get("category") == 1:
+                    by_category = f
+                elif by_mime is None and "video" in (f.get("mime_type") or "").lower():
+                    by_mime = f
+        
+        if by_category is not None:
+            return by_category
+        if by_mime is not None:
+            return by_mime
         
         # Return first file
         return file_list[0] if file_list else None
@@ -671,19 +769,36 @@ class TeraboxExtractor:
 # ==================== TELEGRAM BOT ====================
 
 router = Router()
-extractor = TeraboxExtractor()
+
+# Verified TLS, shared by every connection in the pool
+_SSL_CONTEXT = ssl.create_default_context()
+_SSL_CONTEXT.set_alpn_protocols(["http/1.1"])
+
+
+def create_resolver() -> aiohttp.AsyncResolver:
+    """Create the shared DNS resolver (c-ares keeps lookups off the thread pool)."""
+    # Empty DNS_NAMESERVERS means use the system's nameservers
+    if DNS_NAMESERVERS:
+        return aiohttp.AsyncResolver(nameservers=DNS_NAMESERVERS, timeout=2, tries=2)
+    return aiohttp.AsyncResolver(timeout=2, tries=2)
 
 
-def format_size(size: int) -> str:
-    """Format bytes to readable size."""
-    if size <= 0:
-        return "Unknown"
-    size = size
-    for unit in ['B', 'KB', 'MB', 'GB']:
-        if size < 1024:
-            return f"{size:.2f} {unit}"
-        size /= 1024
-    return f"{size:.2f} TB"
+def create_http_session(resolver: aiohttp.AsyncResolver) -> aiohttp.ClientSession:
+    """Create the shared HTTP session for all extractions."""
+    timeout = aiohttp.ClientTimeout(total=30)
+    connector = aiohttp.TCPConnector(
+        resolver=resolver,
+        ssl=_SSL_CONTEXT,
+        limit=128,
+        limit_per_host=32,
+        ttl_dns_cache=600,
+        keepalive_timeout=75,
+    )
+    return aiohttp.ClientSession(
+        timeout=timeout,
+        connector=connector,
+        cookie_jar=aiohttp.CookieJar(unsafe=True),
+    )
 
 
 @router.message(CommandStart())
@@ -740,8 +855,32 @@ async def cmd_ping(message: Message):
     await message.answer("🏓 Pong! Bot is running.")
 
 
+PROCESSING_TEXT = "⏳ <i>Extracting video...</i>"
+
+
+def format_result(result: VideoResult) -> Tuple[str, InlineKeyboardMarkup]:
+    """Build the reply text and button for a successful result."""
+    response = f"""✅ <b>Video Found!</b>
+
+📹 <b>Title:</b> <code>{result.title[:100]}</code>
+📊 <b>Size:</b> {result.size_str}
+
+🔗 <b>Stream URL:</b>
+<code>{result.stream_url[:500]}</code>
+
+<b>Share ID:</b> {result.surl}
+"""
+    
+    # Create button
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="▶️ Open Video", url=result.stream_url[:2048])]
+    ])
+    
+    return response, keyboard
+
+
 @router.message(F.text)
-async def handle_link(message: Message):
+async def handle_link(message: Message, extractor: TeraboxExtractor):
     """Handle Terabox links."""
     text = message.text.strip()
     
@@ -754,8 +893,20 @@ async def handle_link(message: Message):
         await message.answer("❌ Not a Terabox link. Send a valid Terabox URL.")
         return
     
+    # Cached result: reply once, no placeholder round-trip
+    surl, _ = DomainManager.extract_surl(text)
+    cached = _RESULT_CACHE.get(surl) if surl else None
+    if cached is not None:
+        response, keyboard = format_result(cached)
+        await message.answer(
+            response,
+            reply_markup=keyboard,
+            disable_web_page_preview=True
+        )
+        return
+    
     # Processing message
-    processing = await message.answer("⏳ <i>Extracting video...</i>")
+    processing = await message.answer(PROCESSING_TEXT)
     
     try:
         # Extract
@@ -765,22 +916,7 @@ async def handle_link(message: Message):
             await processing.edit_text(f"❌ <b>Failed:</b>\n{result.error}")
             return
         
-        # Format response
-        response = f"""✅ <b>Video Found!</b>
-
-📹 <b>Title:</b> <code>{result.title[:100]}</code>
-📊 <b>Size:</b> {result.size_str}
-
-🔗 <b>Stream URL:</b>
-<code>{result.stream_url[:500]}</code>
-
-<b>Share ID:</b> {result.surl}
-"""
-        
-        # Create button
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="▶️ Open Video", url=result.stream_url[:2048])]
-        ])
+        response, keyboard = format_result(result)
         
         await processing.edit_text(
             response,
@@ -798,6 +934,12 @@ async def handle_link(message: Message):
 async def on_startup(app: web.Application):
     """Startup handler."""
     bot: Bot = app["bot"]
+    dp: Dispatcher = app["dp"]
+    
+    # Shared HTTP session, reused by every extraction
+    app["resolver"] = create_resolver()
+    app["session"] = create_http_session(app["resolver"])
+    dp["extractor"] = TeraboxExtractor(app["session"])
     
     if WEBHOOK_URL:
         webhook_path = f"/webhook/{BOT_TOKEN}"
@@ -812,7 +954,9 @@ async def on_shutdown(app: web.Application):
     """Shutdown handler."""
     bot: Bot = app["bot"]
     await bot.delete_webhook()
-    await extractor.close()
+    await app["session"].close()
+    # The connector doesn't close its resolver
+    await app["resolver"].close()
     await bot.session.close()
     logger.info("Bot stopped!")
 
@@ -834,6 +978,7 @@ def create_app() -> web.Application:
     
     app = web.Application()
     app["bot"] = bot
+    app["dp"] = dp
     
     # Routes
     app.router.add_get("/", health)
@@ -862,12 +1007,17 @@ async def run_polling():
     dp = Dispatcher()
     dp.include_router(router)
     
+    resolver = create_resolver()
+    session = create_http_session(resolver)
+    dp["extractor"] = TeraboxExtractor(session)
+    
     logger.info("Starting polling...")
     
     try:
         await dp.start_polling(bot, drop_pending_updates=True)
     finally:
-        await extractor.close()
+        await session.close()
+        await resolver.close()
         await bot.session.close()
 
 
@@ -881,6 +1031,10 @@ def main():
     logger.info("Terabox Extractor Bot")
     logger.info("=" * 40)
     
+    # libuv event loop for both webhook and polling modes
+    if uvloop is not None:
+        uvloop.install()
+    
     if WEBHOOK_URL:
         # Production: webhook mode
         logger.info(f"Mode: Webhook")